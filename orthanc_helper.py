@@ -1,9 +1,225 @@
 import os
+import sys
 import json
-import threading
+import queue
+import atexit
+import asyncio
+import logging
+import logging.handlers
+import functools
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pyorthanc import Orthanc
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Progress messages go through a queue and are written by a background listener,
+# so concurrent workers never block on stdout.
+log = logging.getLogger("orthanc_helper")
+log.setLevel(logging.INFO)
+log.propagate = False
+_log_queue = queue.Queue(-1)
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler(sys.stdout))
+log.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+
+def _flush_log() -> None:
+    """
+    Waits until queued log records are written, so interactive prompts show up after them.
+    """
+    _log_queue.join()
+
+
+# Upper bounds for a single STOW-RS upload request. Parts are read into memory when a batch is posted,
+# so only a few batches are sent at once to keep memory use and open files bounded.
+_STOW_BATCH_SIZE = 50 << 20
+_STOW_BATCH_FILES = 200
+_STOW_REQUESTS_IN_FLIGHT = 4
+
+# DICOM person names separate components with '^', file names use '_'.
+_CARET_TO_UNDERSCORE = str.maketrans({"^": "_"})
+
+# Query skeletons, filled in with values per call.
+_MODALITY_DATE_QUERY = {
+    "Level": "Study",
+    "Query": {
+        "AccessionNumber": "",
+        "PatientBirthDate": "",
+        "PatientID": "",
+        "PatientName": "",
+        "PatientSex": "",
+        "StudyDate": "",
+        "StudyDescription": "",
+    },
+}
+_DATE_QUERY = {
+    "Level": "Study",
+    "Query": {"Modality": "", "StudyDate": "", "PatientID": "*"},
+}
+_PATIENT_NAME_QUERY = {
+    "Level": "Study",
+    "Query": {"Modality": "", "PatientName": ""},
+}
+
+
+def _iter_files(folder_path: str):
+    """
+    Yields paths of all files found in folder_path and its subfolders.
+    """
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_files(entry.path)
+            elif entry.is_file():
+                yield entry.path
+
+
+def _read_files(file_paths: list) -> list:
+    """
+    Returns contents of file_paths. Each file is only open while it is being read.
+    """
+    contents = []
+    for file_path in file_paths:
+        with open(file_path, 'rb') as f:
+            contents.append(f.read())
+    return contents
+
+
+def _stow_failed_instances(stow_response) -> list:
+    """
+    Returns SOP Instance UIDs listed in the FailedSOPSequence (0008,1198) of a STOW-RS response.
+    """
+    if not isinstance(stow_response, dict):
+        return []
+    failed = stow_response.get("00081198", {}).get("Value", [])
+    return [item.get("00081155", {}).get("Value", ["unknown"])[0] for item in failed]
+
+
+def _concurrency_alias(concurrency: int, old_value, old_name: str) -> int:
+    """
+    Returns old_value in place of concurrency when the deprecated old_name keyword was used.
+    """
+    if old_value is None:
+        return concurrency
+    warnings.warn(f"{old_name} is deprecated, use concurrency instead.", DeprecationWarning, stacklevel=3)
+    return old_value
+
+
+def _run(coroutine):
+    """
+    Runs coroutine to completion on a new event loop, using uvloop when it is installed.
+    uvloop.run only exists in uvloop 0.18+, older versions fall back to the default loop.
+    """
+    if uvloop is not None and hasattr(uvloop, "run"):
+        return uvloop.run(coroutine)
+    return asyncio.run(coroutine)
+
+
+async def _pool(jobs, handle, concurrency: int) -> int:
+    """
+    Awaits handle(job) for every job using concurrency workers.
+    Workers pull the next job from the shared (async) iterator as soon as they are free, so slow jobs don't hold up the rest.
+    Returns number of handled jobs.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1.")
+    done = object()
+    if hasattr(jobs, '__aiter__'):
+        jobs = jobs.__aiter__()
+        # An async generator can't be advanced by two workers at once.
+        lock = asyncio.Lock()
+
+        async def next_job():
+            async with lock:
+                try:
+                    return await jobs.__anext__()
+                except StopAsyncIteration:
+                    return done
+    else:
+        jobs = iter(jobs)
+
+        async def next_job():
+            return next(jobs, done)
+
+    async def worker():
+        handled = 0
+        while (job := await next_job()) is not done:
+            await handle(job)
+            handled += 1
+        return handled
+
+    return sum(await asyncio.gather(*[worker() for _ in range(concurrency)]))
+
+
+def _study_details_from_info(study_info: dict) -> tuple:
+    """
+    Extracts patients name, study time and study date from a study information dict.
+    See Server.get_study_details for the formats.
+    """
+    p_name = study_info['PatientMainDicomTags']['PatientName'].translate(_CARET_TO_UNDERSCORE).rstrip("_")
+
+    study_date = study_info['MainDicomTags']['StudyDate']
+    study_time = study_info['MainDicomTags']['StudyTime']
+    return p_name, study_time, study_date
+
+
+class _PooledOrthanc(Orthanc):
+    """
+    pyorthanc client that sends every request through one persistent requests.Session
+    so that connections are kept alive and reused instead of opened per call.
+    """
+    def __init__(self, orthanc_url: str, session: requests.Session) -> None:
+        super().__init__(orthanc_url)
+        self._session = session
+
+    def get_request(self, route: str, params: dict = None, return_as_bytes: bool = False):
+        response = self._session.get(route, params=params, auth=self._credentials)
+        if response.status_code == 200:
+            if return_as_bytes:
+                return response.content
+            try:
+                return response.json()
+            except ValueError:
+                return response.content
+        raise requests.HTTPError(f'HTTP code: {response.status_code}, with content: {response.text}')
+
+    def delete_request(self, route: str) -> bool:
+        response = self._session.delete(route, auth=self._credentials)
+        if response.status_code == 200:
+            return True
+        if response.status_code == 404:
+            return False
+        raise requests.HTTPError(f'HTTP code: {response.status_code}, with content: {response.text}')
+
+    def post_request(self, route: str, data=None, return_as_bytes: bool = False):
+        if type(data) != bytes:
+            data = json.dumps(data)
+        response = self._session.post(route, data=data, auth=self._credentials)
+        if response.status_code == 200:
+            if return_as_bytes:
+                return response.content
+            try:
+                return response.json()
+            except ValueError:
+                return response.content
+        raise requests.HTTPError(f'HTTP code: {response.status_code}, with text: {response.text}')
+
+    def put_request(self, route: str, data=None) -> None:
+        response = self._session.put(route, data=json.dumps(data), auth=self._credentials)
+        if response.status_code == 200:
+            return
+        raise requests.HTTPError(f'HTTP code: {response.status_code}, with text: {response.text}')
+
 
 class Server():
     def __init__(self, server_url: str=None, username: str=None, password: str=None) -> None:
@@ -20,8 +236,18 @@ class Server():
         """
         if not server_url:
             server_url, username, password = self.load_credentials()
-        self.server = Orthanc(server_url)
+        self.server_url = server_url.rstrip("/")
+        self._auth = aiohttp.BasicAuth(username, password)
+        self._session = requests.Session()
+        self._session.auth = (username, password)
+        self._session.headers['Connection'] = 'keep-alive'
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=Retry(total=3, backoff_factor=0.2))
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self.server = _PooledOrthanc(server_url, self._session)
         self.server.setup_credentials(username, password)
+        # Study tags don't change while the study exists, cache per instance and clear on deletes.
+        self.get_study_details = functools.lru_cache(maxsize=4096)(self.get_study_details)
 
     def load_credentials(self) -> tuple:
         """
@@ -38,7 +264,7 @@ class Server():
         password = data['server']['password']
         return server_url, username, password
 
-    def upload_folder(self, folder_path: str, threads_no: int = 4) -> None:
+    def upload_folder(self, folder_path: str, concurrency: int = 32, threads_no: int = None) -> None:
         """
         Uploads all dicom files found in folder_path recursively to the dicom server.
         
@@ -46,31 +272,148 @@ class Server():
         ----------
         folder_path: str
             Path to the folder that contains dicom files.
+        concurrency: int
+            Maximum number of uploads in flight at the same time. 32 by default.
         threads_no: int
-            Number of threads to use for uploading. 4 by default.
-        """        
-        dicom_files = []
-        for path, subdirs, files in os.walk(folder_path):
-            for name in files:
-                dicom_files.append(os.path.join(path, name))
-
-        def upload_instances(dicom_list):
-            for dicom_file in dicom_list:
-                with open(dicom_file, 'rb') as image:
-                    self.server.post_instances(image.read())
-                print(f"Uploaded {dicom_file}.")
-
-        threads = []
-        for i in range(threads_no):
-            upload_files = dicom_files[i::threads_no]
-            t = threading.Thread(target=upload_instances, args=(upload_files, ))
-            t.start()
-            threads.append(t)
-            
-        for thread in threads:
-            thread.join()
-
-        print(f"Uploaded {len(dicom_files)} dicom files found in {folder_path}.")
+            Deprecated alias of concurrency.
+        """
+        concurrency = _concurrency_alias(concurrency, threads_no, "threads_no")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1.")
+        uploaded, failed = _run(self._upload_folder_async(folder_path, concurrency))
+        log.info("Uploaded %d dicom files found in %s.", uploaded, folder_path)
+        if failed:
+            log.warning("%d files were rejected by the server: %s", len(failed), ", ".join(failed))
+
+    def _client_session(self, concurrency: int) -> aiohttp.ClientSession:
+        """
+        Creates an authenticated aiohttp session whose keep-alive connections are shared by all requests of one run.
+
+        Parameters
+        ----------
+        concurrency: int
+            Maximum number of open connections.
+        """
+        connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=75)
+        # C-MOVEs and study archives can take much longer than aiohttp's default 5 minutes.
+        timeout = aiohttp.ClientTimeout(total=None)
+        return aiohttp.ClientSession(auth=self._auth, connector=connector, timeout=timeout)
+
+    async def _upload_folder_async(self, folder_path: str, concurrency: int = 32) -> int:
+        """
+        Uploads every file found in folder_path over a single keep-alive aiohttp session.
+        When the DICOMweb plugin is enabled, files of the same folder are sent together as STOW-RS
+        multipart requests of up to ~50 MB, otherwise (and for zip files) each file is posted to /instances.
+        If STOW-RS turns out to be disabled, or rejects some instances of a batch, those files fall back to /instances.
+        One reader walks the tree into a small bounded queue while the posters upload, so listing overlaps with transfers.
+
+        Parameters
+        ----------
+        folder_path: str
+            Path to the folder that contains dicom files.
+        concurrency: int
+            Maximum number of uploads in flight at the same time.
+
+        Return
+        ------
+        tuple : int, list
+            Number of uploaded files and paths of the files the server rejected.
+            Rejected files are logged and skipped, so one bad file doesn't stop the rest of the upload.
+        """
+        failed_files = []
+        pending = asyncio.Queue(maxsize=8)
+        stow_slots = asyncio.Semaphore(_STOW_REQUESTS_IN_FLIGHT)
+
+        async with self._client_session(concurrency) as session:
+            async with session.get(f"{self.server_url}/plugins/dicom-web") as response:
+                stow = response.status == 200
+
+            async def read_files():
+                # Walking lazily lets uploading start before the whole tree is listed.
+                # Only paths are queued, files are opened by the posters.
+                batch, batch_folder, batch_size = [], None, 0
+                for dicom_file in _iter_files(folder_path):
+                    if not stow or dicom_file.lower().endswith('.zip'):
+                        await pending.put((False, [dicom_file]))
+                        continue
+                    folder = os.path.dirname(dicom_file)
+                    size = os.path.getsize(dicom_file)
+                    if batch and (folder != batch_folder or batch_size + size > _STOW_BATCH_SIZE
+                                  or len(batch) == _STOW_BATCH_FILES):
+                        await pending.put((True, batch))
+                        batch, batch_size = [], 0
+                    batch.append(dicom_file)
+                    batch_folder = folder
+                    batch_size += size
+                if batch:
+                    await pending.put((True, batch))
+                for _ in range(concurrency):
+                    await pending.put(None)
+
+            async def post_instance(dicom_file):
+                """
+                Returns True if the server stored dicom_file.
+                The open file is streamed in chunks, so the whole file is never copied onto the heap.
+                """
+                f = await asyncio.to_thread(open, dicom_file, 'rb')
+                try:
+                    async with session.post(f"{self.server_url}/instances", data=f) as response:
+                        response.raise_for_status()
+                except aiohttp.ClientResponseError as error:
+                    log.warning("Failed to upload %s: HTTP %d %s.", dicom_file, error.status, error.message)
+                    failed_files.append(dicom_file)
+                    return False
+                finally:
+                    await asyncio.to_thread(f.close)
+                log.info("Uploaded %s.", dicom_file)
+                return True
+
+            async def post_stow(files):
+                """Returns True if STOW-RS stored every file of the batch."""
+                nonlocal stow
+                async with stow_slots:
+                    if not stow:
+                        return False
+                    writer = aiohttp.MultipartWriter('related')
+                    for content in await asyncio.to_thread(_read_files, files):
+                        writer.append(content, {'Content-Type': 'application/dicom'})
+                    content_type = f'multipart/related; type="application/dicom"; boundary={writer.boundary}'
+                    async with session.post(f"{self.server_url}/dicom-web/studies", data=writer,
+                                            headers={'Content-Type': content_type}) as response:
+                        if response.status in (404, 405):
+                            if stow:
+                                log.info("STOW-RS is not available, uploading files one by one.")
+                            stow = False
+                            return False
+                        if response.status >= 400:
+                            log.warning("STOW-RS request for %s failed with HTTP %d, posting the folder to /instances instead.",
+                                        os.path.dirname(files[0]), response.status)
+                            return False
+                        status = response.status
+                        stow_response = await response.json(content_type=None)
+                failed = _stow_failed_instances(stow_response)
+                if status == 202 or failed:
+                    log.warning("STOW-RS rejected %d instances from %s (%s), posting the folder to /instances instead.",
+                                len(failed), os.path.dirname(files[0]), ", ".join(failed) or "no details")
+                    return False
+                for dicom_file in files:
+                    log.info("Uploaded %s.", dicom_file)
+                return True
+
+            async def post_files():
+                uploaded = 0
+                while (item := await pending.get()) is not None:
+                    is_stow, files = item
+                    if is_stow and await post_stow(files):
+                        uploaded += len(files)
+                        continue
+                    # Instances STOW-RS already stored are simply reported as already stored by /instances.
+                    for dicom_file in files:
+                        uploaded += await post_instance(dicom_file)
+                return uploaded
+
+            _, *uploaded = await asyncio.gather(read_files(), *[post_files() for _ in range(concurrency)])
+        return sum(uploaded), failed_files
 
     def get_study_details(self, study_id: str) -> tuple:
         """
@@ -86,16 +429,107 @@ class Server():
         tuple : str, str, str
             tuple of patients name, study time (time_date), study date
             Formats: lastName_firstName (or the other way around depending on original input), hhmmss, yyyymmdd
+
+        Results are cached until studies are deleted through this Server.
         """
         study_info = self.server.get_study_information(study_id)
-        p_name = study_info['PatientMainDicomTags']['PatientName']
-        p_name = p_name.rstrip("^").replace("^","_")
+        return _study_details_from_info(study_info)
+
+    def _list_studies_expanded(self) -> list:
+        """
+        Gets information of all the studies on the server with a single expanded request.
 
-        study_date = study_info['MainDicomTags']['StudyDate']
-        study_time = study_info['MainDicomTags']['StudyTime']
-        return p_name, study_time, study_date
+        Return
+        ------
+        list
+            List of study information dicts, as returned by /studies/{id}.
+        """
+        return self.server.get_request(f"{self.server_url}/studies", params={'expand': 'true'})
 
-    def date_modality_to_server(self, modality: str, date: str, server_name: str = "ORTHANC", threads_no: int = 2) -> None:
+    def _find_studies(self, search_data: dict, expand: bool = True, page_size: int = 500):
+        """
+        Runs a study level /tools/find query and yields full study information, or only ids when expand is False.
+        Results are requested in pages of page_size (Limit/Since) and the next page is fetched
+        while the current one is being processed.
+
+        Parameters
+        ----------
+        search_data: dict
+            Body of the /tools/find request.
+        expand: bool
+            Whether to return study information instead of ids. True by default.
+        page_size: int
+            Number of studies requested per page. 500 by default.
+
+        Yields
+        ------
+        dict or str
+            Study information, as returned by /studies/{id}, or study id.
+        """
+        def find_page(since):
+            return self.server.c_find(dict(search_data, Expand=expand, Limit=page_size, Since=since))
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            next_page = executor.submit(find_page, 0)
+            since = 0
+            while next_page is not None:
+                page = next_page.result()
+                since += len(page)
+                next_page = executor.submit(find_page, since) if len(page) == page_size else None
+                yield from page
+
+    async def _find_studies_async(self, session: aiohttp.ClientSession, search_data: dict, page_size: int = 500):
+        """
+        Async version of _find_studies for code running on the event loop.
+        Yields expanded study information, page by page, while the next page is requested in a background task.
+
+        Parameters
+        ----------
+        session: aiohttp.ClientSession
+            Session to send the /tools/find requests with.
+        search_data: dict
+            Body of the /tools/find request.
+        page_size: int
+            Number of studies requested per page. 500 by default.
+
+        Yields
+        ------
+        dict
+            Study information, as returned by /studies/{id}.
+        """
+        async def find_page(since):
+            body = dict(search_data, Expand=True, Limit=page_size, Since=since)
+            async with session.post(f"{self.server_url}/tools/find", json=body) as response:
+                response.raise_for_status()
+                return await response.json()
+
+        next_page = asyncio.create_task(find_page(0))
+        since = 0
+        while next_page is not None:
+            page = await next_page
+            since += len(page)
+            next_page = asyncio.create_task(find_page(since)) if len(page) == page_size else None
+            for study_info in page:
+                yield study_info
+
+    def _download_study_zip(self, study_id: str, file_path: str) -> None:
+        """
+        Streams the zip archive of a study into file_path, 1 MiB at a time, without holding it in memory.
+
+        Parameters
+        ----------
+        study_id : str
+            Unique id of the study.
+        file_path: str
+            Path of the zip file to write.
+        """
+        with self._session.get(f"{self.server_url}/studies/{study_id}/archive", stream=True) as response:
+            response.raise_for_status()
+            with open(file_path, 'wb') as study_zip:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    study_zip.write(chunk)
+
+    def date_modality_to_server(self, modality: str, date: str, server_name: str = "ORTHANC", concurrency: int = 2, threads_no: int = None) -> None:
         """
         Downloads studies created on specified date and from specified modality to specified ORTHANC server.
         
@@ -107,45 +541,50 @@ class Server():
             Date on which patients studies were created. Format 'yyyymmdd'.
         server_name: str
             Name of your ORTHANC server. 'ORTHANC' by default.
+        concurrency: int
+            Maximum number of studies retrieved at the same time. 2 by default, since many PACS limit concurrent associations.
         threads_no: int
-            Number of threads to use for downloading. 2 by default.
-        """
-        d1 = '''{
-        "Level" : "Study",
-        "Query" : {
-        "AccessionNumber" : "",
-        "PatientBirthDate" : "",
-        "PatientID" : "",
-        "PatientName" : "",
-        "PatientSex" : "",'''
-        d2 = f'\n\t"StudyDate" : "{date}",'
-        d3 = '''\n\t"StudyDescription" : ""
-        }
-        }'''
-        search_data = json.loads(d1+d2+d3)
+            Deprecated alias of concurrency.
+        """
+        concurrency = _concurrency_alias(concurrency, threads_no, "threads_no")
+        search_data = {**_MODALITY_DATE_QUERY, "Query": {**_MODALITY_DATE_QUERY["Query"], "StudyDate": date}}
         result = self.server.query_on_modality(modality, data=search_data)
         query_id = result['ID']
-        server_data = {'TargetAet': f"{server_name}"}
         answers = self.server.get_query_answers(query_id)
+        log.info("%d studies found on %s. Downloading to %s", len(answers), date, server_name)
+        _run(self._retrieve_answers_async(query_id, answers, server_name, concurrency))
+        log.info("Finished download %d", len(answers))
+
+    async def _retrieve_answers_async(self, query_id: str, answers: list, server_name: str, concurrency: int) -> None:
+        """
+        Retrieves (C-MOVE) the given answers of a modality query to the specified ORTHANC server.
+
+        Parameters
+        ----------
+        query_id: str
+            Id of the query on the modality.
+        answers: list
+            Indexes of the query answers to retrieve.
+        server_name: str
+            Name of your ORTHANC server.
+        concurrency: int
+            Maximum number of answers retrieved at the same time.
+        """
+        server_data = {'TargetAet': f"{server_name}"}
+
+        async with self._client_session(concurrency) as session:
+            async def download_answer(index):
+                answer_url = f"{self.server_url}/queries/{query_id}/answers/{index}"
+                async with session.get(f"{answer_url}/content") as response:
+                    response.raise_for_status()
+                    patient_name = (await response.json())['0010,0010']['Value']
+                log.info("Downloading %s to %s", patient_name, server_name)
+                async with session.post(f"{answer_url}/retrieve", json=server_data) as response:
+                    response.raise_for_status()
 
-        def download_answer(index_list):
-            for index in index_list:
-                patient_name = self.server.get_content_of_specified_query_answer(query_id, index)['0010,0010']['Value']
-                print(f"Downloading {patient_name} to {server_name}")
-                self.server.send_resource_to_other_modality(query_id, index, server_data)
-
-        threads = []
-        print(f"{len(answers)} studies found on {date}. Downloading to {server_name}")
-        for i in range(threads_no):
-            index_list = answers[i::threads_no]
-            t = threading.Thread(target=download_answer, args=(index_list, ))
-            t.start()
-            threads.append(t)
-        for thread in threads:
-            thread.join()
-        print(f"Finished download {len(answers)}")
-
-    def date_range_modality_to_server(self, modality: str, from_date: str, to_date: str, server_name: str = "ORTHANC", thread_no: int = 2) -> None:
+            await _pool(answers, download_answer, concurrency)
+
+    def date_range_modality_to_server(self, modality: str, from_date: str, to_date: str, server_name: str = "ORTHANC", concurrency: int = 2, thread_no: int = None) -> None:
         """
         Downloads studies created on specified date range and from specified modality to specified ORTHANC server.
         
@@ -159,13 +598,16 @@ class Server():
             End of the date range. Format 'yyyymmdd'
         server_name: str
             Name of your ORTHANC server. 'ORTHANC' by default.
-        threads_no: int
-            Number of threads to use for downloading. 2 by default.
+        concurrency: int
+            Maximum number of studies retrieved at the same time. 2 by default, since many PACS limit concurrent associations.
+        thread_no: int
+            Deprecated alias of concurrency.
         """
-        self.date_modality_to_server(modality, f"{from_date}-{to_date}", server_name, thread_no)
-        print(f"Finished downloading all studies between {from_date} and {to_date} from {modality} to {server_name}.")
+        concurrency = _concurrency_alias(concurrency, thread_no, "thread_no")
+        self.date_modality_to_server(modality, f"{from_date}-{to_date}", server_name, concurrency)
+        log.info("Finished downloading all studies between %s and %s from %s to %s.", from_date, to_date, modality, server_name)
 
-    def date_server_to_local(self, date: str, download_path: str, threads_no: int = 2) -> None:
+    def date_server_to_local(self, date: str, download_path: str, concurrency: int = 8, threads_no: int = None) -> None:
         """
         Downloads studies (from ORTHANC server to local machine) that were created on a specified date and stores them as zip files.
         
@@ -175,41 +617,50 @@ class Server():
             Date on which studies were created. Format 'yyyymmdd'.
         download_path: str
             Folder to which to download studies.
+        concurrency: int
+            Maximum number of studies downloaded at the same time. 8 by default.
         threads_no: int
-            Number of threads to use for downloading. 2 by default.
-        """
-        d1 = '''{
-                    "Level" : "Study",
-                    "Query" : {
-                        "Modality" : "",'''
-        d2 = f'''\n\t"StudyDate" : "{date}",'''
-        d3 = '''\n\t"PatientID" : "*"
-                    }
-                    }'''
-        search_data = json.loads(d1+d2+d3)
-        studies_ids = self.server.c_find(search_data)
-
-
-        def download_studies(studies):
-            for study_id in studies:
-                p_name, study_time, study_date = self.get_study_details(study_id)
+            Deprecated alias of concurrency.
+        """
+        concurrency = _concurrency_alias(concurrency, threads_no, "threads_no")
+        search_data = {**_DATE_QUERY, "Query": {**_DATE_QUERY["Query"], "StudyDate": date}}
+        downloaded = _run(self._download_studies_async(search_data, download_path, concurrency))
+        log.info("Finished downloading %d studies.", downloaded)
+
+    async def _download_studies_async(self, search_data: dict, download_path: str, concurrency: int) -> int:
+        """
+        Streams zip archives of the studies matching search_data into download_path, named patientName_studyTime.zip.
+        Downloads start as soon as the first page of find results arrives.
+
+        Parameters
+        ----------
+        search_data: dict
+            Body of the /tools/find request.
+        download_path: str
+            Folder to which to download studies.
+        concurrency: int
+            Maximum number of studies downloaded at the same time.
+        """
+        async with self._client_session(concurrency) as session:
+            async def download_study(study_info):
+                p_name, study_time, study_date = _study_details_from_info(study_info)
                 file_name = f"{p_name}_{study_time}.zip"
                 file_path = os.path.join(download_path,file_name)
-                print(f"Downloading {file_name}.")
-                with open(file_path, 'wb') as study_zip:
-                    study_zip.write(self.server.get_study_zip_file(study_id))
-        
-        threads = []
-        for i in range(threads_no):
-            studies = studies_ids[i::threads_no]
-            t = threading.Thread(target=download_studies, args=(studies, ))
-            t.start()
-            threads.append(t)
-        for thread in threads:
-            thread.join()
-        print(f"Finished downloading {len(studies_ids)} studies.")
-
-    def date_range_server_to_local(self, from_date: str, to_date: str,  download_path: str, thread_no: int = 2) -> None:
+                log.info("Downloading %s.", file_name)
+                async with session.get(f"{self.server_url}/studies/{study_info['ID']}/archive") as response:
+                    response.raise_for_status()
+                    # Disk writes run in worker threads so they don't stall the other downloads on the event loop.
+                    study_zip = await asyncio.to_thread(open, file_path, 'wb')
+                    try:
+                        async for chunk in response.content.iter_chunked(1 << 20):
+                            await asyncio.to_thread(study_zip.write, chunk)
+                    finally:
+                        await asyncio.to_thread(study_zip.close)
+
+            studies_info = self._find_studies_async(session, search_data)
+            return await _pool(studies_info, download_study, concurrency)
+
+    def date_range_server_to_local(self, from_date: str, to_date: str,  download_path: str, concurrency: int = 8, thread_no: int = None) -> None:
         """
         Downloads studies (from ORTHANC server to local machine) that were created between specified date range.
         
@@ -221,13 +672,48 @@ class Server():
             End of the date range. Format 'yyyymmdd'
         download_path: str
             Folder to which to download studies.
-        threads_no: int
-            Number of threads to use for downloading. 2 by default.
+        concurrency: int
+            Maximum number of studies downloaded at the same time. 8 by default.
+        thread_no: int
+            Deprecated alias of concurrency.
         """
-        self.date_server_to_local(f"{from_date}-{to_date}", download_path)
-        print(f"Finished downloading all studies between {from_date} and {to_date} to {download_path}.")
+        concurrency = _concurrency_alias(concurrency, thread_no, "thread_no")
+        self.date_server_to_local(f"{from_date}-{to_date}", download_path, concurrency)
+        log.info("Finished downloading all studies between %s and %s to %s.", from_date, to_date, download_path)
 
-    def delete_on_date(self, date: str) -> None:
+    def _delete_studies(self, studies_ids: list, workers: int = 16) -> int:
+        """
+        Deletes given studies with a single /tools/bulk-delete request (Orthanc 1.9.4+).
+        Older servers get parallel per-study deletes over the pooled keep-alive connections instead.
+
+        Parameters
+        ----------
+        studies_ids : list
+            Ids of the studies to delete.
+        workers: int
+            Number of deletes in flight at the same time. 16 by default.
+
+        Return
+        ------
+        int
+            Number of deleted studies.
+        """
+        if not studies_ids:
+            return 0
+        try:
+            self.server.post_request(f"{self.server_url}/tools/bulk-delete", {"Resources": studies_ids})
+            deleted = len(studies_ids)
+            log.info("Deleted %d/%d studies.", deleted, len(studies_ids))
+        except requests.HTTPError:
+            log.info("Bulk delete is not available, deleting studies one by one.")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for deleted, _ in enumerate(executor.map(self.server.delete_study, studies_ids), 1):
+                    if deleted % 100 == 0 or deleted == len(studies_ids):
+                        log.info("Deleted %d/%d studies.", deleted, len(studies_ids))
+        self.get_study_details.cache_clear()
+        return deleted
+
+    def delete_on_date(self, date: str, verbose: bool = False) -> None:
         """
         Deletes studies done on a specified date.
         
@@ -235,27 +721,24 @@ class Server():
         ----------
         date : str
             Date on which studies were created. Format 'yyyymmdd'.
+        verbose: bool
+            Log name, date and time of every deleted study. False by default, which only fetches study ids.
         """
 
-        d1 = '''{
-                    "Level" : "Study",
-                    "Query" : {
-                        "Modality" : "",'''
-        d2 = f'''\n\t"StudyDate" : "{date}",'''
-        d3 = '''\n\t"PatientID" : "*"
-                    }
-                    }'''
-        search_data = json.loads(d1+d2+d3)
-        studies_ids = self.server.c_find(search_data)
-        total = 0
-        for study_id in studies_ids:
-            p_name, study_time, study_date = self.get_study_details(study_id)
-            print(f"Deleting {p_name}-{study_date}-{study_time}.")
-            self.server.delete_study(study_id)
-            total += 1
-        print(f"Done. Deleted {total} studies done on {date}.")
-
-    def delete_date_range(self, from_date: str, to_date: str) -> None:
+        search_data = {**_DATE_QUERY, "Query": {**_DATE_QUERY["Query"], "StudyDate": date}}
+        if verbose:
+            studies_ids = []
+            for study_info in self._find_studies(search_data):
+                p_name, study_time, study_date = _study_details_from_info(study_info)
+                log.info("Deleting %s-%s-%s.", p_name, study_date, study_time)
+                studies_ids.append(study_info['ID'])
+        else:
+            studies_ids = list(self._find_studies(search_data, expand=False))
+        # Deleting only after all pages are read, so Since offsets stay valid.
+        total = self._delete_studies(studies_ids)
+        log.info("Done. Deleted %d studies done on %s.", total, date)
+
+    def delete_date_range(self, from_date: str, to_date: str, verbose: bool = False) -> None:
         """
         Deletes studies that were created between specified date range.
         
@@ -265,8 +748,10 @@ class Server():
             Start of the date range. Format 'yyyymmdd'.
         to_date: str
             End of the date range. Format 'yyyymmdd'
+        verbose: bool
+            Log name, date and time of every deleted study. False by default.
         """
-        self.delete_on_date(f"{from_date}-{to_date}")
+        self.delete_on_date(f"{from_date}-{to_date}", verbose)
 
     def get_studies_list(self) -> list:
         """
@@ -275,14 +760,9 @@ class Server():
         Returns
         ----------
         studies_data : list
-            2d list (list of lists) that contains [patients name, study time (hhmmss), study date (yyyymmdd), study id]
+            list of tuples (patients name, study time (hhmmss), study date (yyyymmdd), study id)
         """
-        studies_ids = self.server.get_studies()
-        studies_data = []
-        for id in studies_ids:
-            p_name, study_time, study_date = self.get_study_details(id)
-            studies_data.append([p_name, study_time, study_date, id])
-        return studies_data
+        return [(*_study_details_from_info(study_info), study_info['ID']) for study_info in self._list_studies_expanded()]
 
     def anon_study_server_to_local(self, patient_name: str, download_path: str) -> None:
         """
@@ -296,44 +776,36 @@ class Server():
         download_path: str
             The path to a folder in which to save anonymized zip file.
         """
-        d1 = '''{
-                    "Level" : "Study",
-                    "Query" : {
-                        "Modality" : "",'''
-        d2 = f'\n\t"PatientName" : "*{patient_name}*"'
-        d3 = '}}'
-        search_data = json.loads(d1+d2+d3)
-        studies_ids = self.server.c_find(search_data)
+        search_data = {**_PATIENT_NAME_QUERY, "Query": {**_PATIENT_NAME_QUERY["Query"], "PatientName": f"*{patient_name}*"}}
+        studies_info = list(self._find_studies(search_data))
+        studies_ids = [study_info['ID'] for study_info in studies_info]
         studies_details = []
-        for study_id in studies_ids:
-            studies_details.append(self.get_study_details(study_id))
+        for study_info in studies_info:
+            studies_details.append(_study_details_from_info(study_info))
         
+        _flush_log()
         print("Choose which study to anonymize.")
         for number, study in enumerate(studies_details):
             print(f"{number} - {study}.")
         choice = int(input("\nType the number of the study you wish to anonymize: "))
         target_id = studies_ids[choice]
         response = self.server.anonymize_study(target_id, {})
-        print("Anonymized selected study.")
+        log.info("Anonymized selected study.")
 
         anon_id = response["ID"]
         file_path = os.path.join(download_path, "Anonymized_patient")
-        with open(file_path, 'wb') as study_zip:
-            print(f"Downloading anonymized zip for {patient_name}.")
-            study_zip.write(self.server.get_study_zip_file(anon_id))
+        log.info("Downloading anonymized zip for %s.", patient_name)
+        self._download_study_zip(anon_id, file_path)
         self.server.delete_study(anon_id)
-        print("Study anonymized and deleted.")
+        self.get_study_details.cache_clear()
+        log.info("Study anonymized and deleted.")
     
     def delete_all_studies(self) -> None:
         """
         Deletes everything from the server.
         """
+        _flush_log()
         print('WARNING!! This will delete everything from your server.')
         input('Press ENTER to continue...')
-        studies = self.server.get_studies()
-        to_delete = len(studies)
-        for study_id in studies:
-            self.server.delete_study(study_id)
-            to_delete -= 1
-            print(f"Deleted {study_id}. Left {to_delete} to delete.")
-        print("Deleted everything.")
+        self._delete_studies(self.server.get_studies())
+        log.info("Deleted everything.")